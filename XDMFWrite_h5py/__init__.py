@@ -1,7 +1,12 @@
+import collections
+import functools
+import itertools
 import os
 import pathlib
-from enum import StrEnum
-from xml.dom import minidom
+import sys
+from collections.abc import Iterable
+from collections.abc import Iterator
+from typing import TextIO
 
 import h5py
 import numpy as np
@@ -10,7 +15,7 @@ from numpy.typing import ArrayLike
 from ._version import version  # noqa: F401
 
 
-class ElementType(StrEnum):
+class ElementType:
     """
     Element types:
 
@@ -26,7 +31,7 @@ class ElementType(StrEnum):
     Hexahedron = "Hexahedron"
 
 
-class AttributeCenter(StrEnum):
+class AttributeCenter:
     """
     Attribute centers:
 
@@ -38,6 +43,19 @@ class AttributeCenter(StrEnum):
     Node = "Node"
 
 
+# valid (rank, number of columns, element-type) of the connectivity
+_VALID_SHAPE = frozenset(
+    [
+        (1, None, ElementType.Polyvertex),
+        (2, 3, ElementType.Triangle),
+        (2, 4, ElementType.Quadrilateral),
+        (2, 8, ElementType.Hexahedron),
+    ]
+)
+
+_ELEMENT_TYPES = frozenset(element_type for _, _, element_type in _VALID_SHAPE)
+
+
 def shape_is_correct(shape: ArrayLike, element_type: ElementType) -> bool:
     """
     Check that a shape matches the expected shape for a certain type.
@@ -47,42 +65,142 @@ def shape_is_correct(shape: ArrayLike, element_type: ElementType) -> bool:
     :return: `True` is the shape is as expected (no guarantee that the data is correct).
     """
 
-    if len(shape) == 1 and element_type == ElementType.Polyvertex:
-        return True
-
-    if len(shape) != 2:
-        return False
-
-    if shape[1] == 3 and element_type == ElementType.Triangle:
-        return True
-
-    if shape[1] == 4 and element_type == ElementType.Quadrilateral:
-        return True
+    return (len(shape), shape[1] if len(shape) == 2 else None, element_type) in _VALID_SHAPE
 
-    if shape[1] == 8 and element_type == ElementType.Hexahedron:
-        return True
 
-    return False
-
-
-def as3d(arg: ArrayLike) -> ArrayLike:
+def as3d(arg: ArrayLike, out: ArrayLike = None) -> ArrayLike:
     r"""
     Return a list of vectors as a list of vectors in 3d (as required by ParaView).
 
     :param [N, d] arg: Input array (``d <= 3``).
+    :param [N, 3] out: Output array, e.g. to reuse a buffer between increments [optional].
     :return: The array zero-padded such that the shape is ``[N, 3]``
     """
 
     assert arg.ndim == 2
 
-    if arg.shape[1] == 3:
+    if arg.shape[1] == 3 and out is None:
         return arg
 
-    ret = np.zeros([arg.shape[0], 3], dtype=arg.dtype)
-    ret[:, : arg.shape[1]] = arg
+    if out is None:
+        out = np.empty([arg.shape[0], 3], dtype=arg.dtype)
+    else:
+        assert out.shape == (arg.shape[0], 3)
+
+    out[:, : arg.shape[1]] = arg
+    out[:, arg.shape[1] :] = 0  # noqa: E203
+    return out
+
+
+def dataset_shapes(group: h5py.Group, paths: Iterable[str] = None) -> dict[str, tuple[int, ...]]:
+    """
+    Read the shapes of (many) datasets in a single traversal of the HDF5-file.
+
+    :param group: File or group to traverse.
+    :param paths: Absolute paths of the datasets of interest [default: all datasets].
+    :return: Shape per absolute path.
+    """
+
+    ret = {}
+    wanted = None if paths is None else set(paths)
+
+    def collect(name, obj):
+        if isinstance(obj, h5py.Dataset) and (wanted is None or obj.name in wanted):
+            ret[obj.name] = obj.shape
+
+    group.visititems(collect)
     return ret
 
 
+# XML templates (the fixed tags are interned such that all stored lines share the same object)
+_OPEN_XDMF = (
+    sys.intern('<?xml version="1.0" ?>'),
+    sys.intern('<Xdmf Version="3.0">'),
+    sys.intern("<Domain>"),
+)
+_CLOSE_XDMF = (sys.intern("</Domain>"), sys.intern("</Xdmf>"))
+_CLOSE_GRID = sys.intern("</Grid>")
+_CLOSE_GEOMETRY = sys.intern("</Geometry>")
+_CLOSE_TOPOLOGY = sys.intern("</Topology>")
+_CLOSE_ATTRIBUTE = sys.intern("</Attribute>")
+_DATAITEM = '<DataItem Dimensions="%s" Format="HDF"> %s:%s </DataItem>'
+_HYPERSLAB = '<DataItem ItemType="HyperSlab" Dimensions="%s" Type="HyperSlab">'
+_SELECTION = '<DataItem Dimensions="3 %d" Format="XML"> %s %s %s </DataItem>'
+_CLOSE_DATAITEM = sys.intern("</DataItem>")
+_COLLECTION = '<Grid CollectionType="Temporal" GridType="Collection" Name="%s">'
+_GRID = '<Grid Name="%s">'
+_TOPOLOGY = '<Topology NumberOfElements="%d" TopologyType="%s">'
+_ATTRIBUTE = '<Attribute AttributeType="%s" Center="%s" Name="%s">'
+_TIMESTEP_TIME = '<Time Value="%s"/>'
+_GEOMETRY = {
+    1: sys.intern('<Geometry GeometryType="X">'),
+    2: sys.intern('<Geometry GeometryType="XY">'),
+    3: sys.intern('<Geometry GeometryType="XYZ">'),
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _shape_str(shape: tuple[int, ...]) -> str:
+    """
+    Format a shape as used in the 'Dimensions' of a DataItem.
+    Cached: the datasets of a :py:class:`TimeSeries` typically share a few shapes.
+
+    :param shape: Shape of a dataset.
+    :return: Space separated shape.
+    """
+    return " ".join(map(str, shape))
+
+
+@functools.lru_cache(maxsize=1024)
+def _dataitem(shape_str: str, filename: str, path: str) -> str:
+    """
+    Render the DataItem that refers to a dataset.
+    Cached: a :py:class:`TimeSeries` typically refers to the same datasets (e.g. the
+    Geometry and Topology) for every time-step, which then share the same string.
+
+    :param shape_str: Space separated shape.
+    :param filename: Filename of the HDF5-file.
+    :param path: Path of the dataset in the HDF5-file.
+    :return: DataItem (one line).
+    """
+    return _DATAITEM % (shape_str, filename, path)
+
+
+def _hyperslab(index: int, shape: tuple[int, ...], filename: str, path: str) -> list[str]:
+    """
+    Render the DataItem that refers to ``dataset[index, ...]`` (a 'HyperSlab' of a dataset).
+
+    :param index: Index along the first axis of the dataset.
+    :param shape: Shape of the (entire) dataset.
+    :param filename: Filename of the HDF5-file.
+    :param path: Path of the dataset in the HDF5-file.
+    :return: DataItem (multiple lines).
+    """
+    rank = len(shape)
+    start = " ".join([str(index)] + ["0"] * (rank - 1))
+    stride = " ".join(["1"] * rank)
+    count = " ".join(["1", *map(str, shape[1:])])
+
+    return [
+        _HYPERSLAB % _shape_str(shape[1:]),
+        _SELECTION % (rank, start, stride, count),
+        _dataitem(_shape_str(shape), filename, path),
+        _CLOSE_DATAITEM,
+    ]
+
+
+def _properties(dataset: h5py.Dataset) -> tuple[str, str, tuple[int, ...]]:
+    """
+    Read the properties of a dataset that are needed to refer to it.
+    Every h5py property access goes through the HDF5 C-API, so they are read only once
+    (``dataset.file`` avoids the extra link lookup done by ``dataset.parent``).
+
+    :param dataset: HDF5-dataset.
+    :return: ``(filename, path, shape)``
+    """
+    return dataset.file.filename, dataset.name, tuple(dataset.shape)
+
+
 class Field:
     """
     Base class of XDMF-fields.
@@ -92,15 +210,25 @@ class Field:
     """
 
     def __init__(self, dataset: h5py.File, name: str):
+        self._set_dataset(*_properties(dataset), name)
 
-        self.filename = dataset.parent.file.filename
-        self.path = dataset.name
-        self.shape = dataset.shape
-        self.shape_str = " ".join(str(i) for i in self.shape)
+    def _set_dataset(self, filename: str, path: str, shape: tuple[int, ...], name: str):
+        """
+        Set the properties of the dataset (shared by all fields).
+        :param filename: Filename of the HDF5-file.
+        :param path: Path of the dataset in the HDF5-file.
+        :param shape: Shape of the dataset.
+        :param name: Name to use in the XDMF-file [default: same as dataset].
+        """
+        self.filename = filename
+        self._filename = filename
+        self.path = path
+        self.shape = tuple(shape)
+        self.shape_str = _shape_str(self.shape)
         self.name = name
 
         if self.name is None:
-            self.name = dataset.name
+            self.name = self.path
 
     def __iter__(self):
         return iter(self.__list__())
@@ -110,13 +238,32 @@ class Field:
         Change the path of the HDF5-file to a path relative to another file (the XDMF-file).
         :param path: Path to make the file relative to.
         """
-        self.filename = os.path.relpath(self.filename, pathlib.Path(path).parent)
+        self._relto(os.path.dirname(os.fspath(path)) or os.curdir)
+
+    def _relto(self, dirname: str):
+        """
+        Change the path of the HDF5-file to a path relative to a directory.
+        :param dirname: Directory (e.g. of the XDMF-file).
+        """
+        head, tail = os.path.split(self._filename)
+
+        if (head or os.curdir) == dirname:
+            self.filename = tail
+        else:
+            self.filename = os.path.relpath(self._filename, dirname)
 
     def __str__(self) -> str:
         """
         Return XML snippet.
         """
-        return minidom.parseString("\n".join(self.__list__())).toprettyxml(newl="")
+        return "\n".join(_iter_indented(self.__list__()))
+
+    def write(self, fp: TextIO):
+        """
+        Write XML snippet to an opened file (line-by-line).
+        :param fp: File object (opened in text mode).
+        """
+        fp.writelines(f"{line}\n" for line in _iter_indented(self.__list__()))
 
 
 class Geometry(Field):
@@ -127,34 +274,40 @@ class Geometry(Field):
     """
 
     def __init__(self, dataset: h5py.Group):
-        super().__init__(dataset, "Geometry")
-        assert len(self.shape) == 2
+        self._init(*_properties(dataset))
 
-    def __list__(self) -> list[str]:
+    @classmethod
+    def from_path(cls, filename: str, path: str, shape: tuple[int, ...]) -> "Geometry":
         """
-        :return: XDMF code snippet.
+        Interpret a dataset as a Geometry, from its properties (without accessing the HDF5-file).
+
+        :param filename: Filename of the HDF5-file.
+        :param path: Path of the dataset in the HDF5-file.
+        :param shape: Shape of the dataset.
         """
+        self = cls.__new__(cls)
+        self._init(filename, path, shape)
+        return self
 
-        ret = []
+    def _init(self, filename: str, path: str, shape: tuple[int, ...]):
+        self._set_dataset(filename, path, shape, "Geometry")
+        assert len(self.shape) == 2
 
-        if self.shape[1] == 1:
-            ret += ['<Geometry GeometryType="X">']
-        elif self.shape[1] == 2:
-            ret += ['<Geometry GeometryType="XY">']
-        elif self.shape[1] == 3:
-            ret += ['<Geometry GeometryType="XYZ">']
-        else:
+        if self.shape[1] not in _GEOMETRY:
             raise OSError("Illegal number of dimensions.")
 
-        ret += [
-            (
-                f'<DataItem Dimensions="{self.shape_str}" Format="HDF"> '
-                f"{self.filename}:{self.path} </DataItem>"
-            )
-        ]
-        ret += ["</Geometry>"]
+        self._open = _GEOMETRY[self.shape[1]]
 
-        return ret
+    def __list__(self) -> list[str]:
+        """
+        :return: XDMF code snippet.
+        """
+
+        return [
+            self._open,
+            _dataitem(self.shape_str, self.filename, self.path),
+            _CLOSE_GEOMETRY,
+        ]
 
 
 class Topology(Field):
@@ -166,30 +319,46 @@ class Topology(Field):
     """
 
     def __init__(self, dataset: h5py.Group, element_type: ElementType):
-        super().__init__(dataset, "Topology")
+        self._init(*_properties(dataset), element_type)
+
+    @classmethod
+    def from_path(
+        cls, filename: str, path: str, shape: tuple[int, ...], element_type: ElementType
+    ) -> "Topology":
+        """
+        Interpret a dataset as a Topology, from its properties (without accessing the HDF5-file).
+
+        :param filename: Filename of the HDF5-file.
+        :param path: Path of the dataset in the HDF5-file.
+        :param shape: Shape of the dataset.
+        :param element_type: Element-type (see :py:class:`ElementType`).
+        """
+        self = cls.__new__(cls)
+        self._init(filename, path, shape, element_type)
+        return self
+
+    def _init(self, filename: str, path: str, shape: tuple[int, ...], element_type: ElementType):
+        self._set_dataset(filename, path, shape, "Topology")
         self.element_type = element_type
 
+        if self.element_type not in _ELEMENT_TYPES:
+            raise ValueError(f"Unknown element-type: {self.element_type}")
+
         if not shape_is_correct(self.shape, self.element_type):
             raise OSError("Incorrect dimensions for type")
 
+        self._open = _TOPOLOGY % (self.shape[0], self.element_type)
+
     def __list__(self) -> list[str]:
         """
         :return: XDMF code snippet.
         """
 
-        ret = []
-        ret += [
-            f'<Topology NumberOfElements="{self.shape[0]:d}" TopologyType="{self.element_type}">'
-        ]
-        ret += [
-            (
-                f'<DataItem Dimensions="{self.shape_str}" Format="HDF"> '
-                f"{self.filename}:{self.path} </DataItem>"
-            )
+        return [
+            self._open,
+            _dataitem(self.shape_str, self.filename, self.path),
+            _CLOSE_TOPOLOGY,
         ]
-        ret += ["</Topology>"]
-
-        return ret
 
 
 class Attribute(Field):
@@ -199,52 +368,119 @@ class Attribute(Field):
     :param dataset: Dataset.
     :param center: How to center the Attribute (see :py:class:`AttributeCenter`).
     :param name: Name to use in the XDMF-file [default: same as dataset]
+    :param index:
+        Use only ``dataset[index, ...]`` (written as a 'HyperSlab').
+        This allows to store a field for all time-steps in one dataset.
     """
 
-    def __init__(self, dataset: h5py.File, center: str, name: str = None):
-        super().__init__(dataset, name)
-        self.center = center
-        assert len(self.shape) > 0
-        assert len(self.shape) < 3
-
-    def __list__(self) -> list[str]:
+    def __init__(self, dataset: h5py.File, center: str, name: str = None, index: int = None):
+        self._init(*_properties(dataset), center, name, index)
+
+    @classmethod
+    def from_path(
+        cls,
+        filename: str,
+        path: str,
+        shape: tuple[int, ...],
+        center: str,
+        name: str = None,
+        index: int = None,
+    ) -> "Attribute":
         """
-        :return: XDMF code snippet.
+        Interpret a dataset as an Attribute, from its properties (without accessing the HDF5-file).
+        For example, to avoid opening many datasets::
+
+            shapes = xh.dataset_shapes(file)
+
+            for i in range(n):
+                path = f"/stress/{i:d}"
+                xdmf += xh.TimeStep()
+                xdmf += xh.Attribute.from_path(file.filename, path, shapes[path], "Cell")
+
+        :param filename: Filename of the HDF5-file.
+        :param path: Path of the dataset in the HDF5-file.
+        :param shape: Shape of the dataset.
+        :param center: How to center the Attribute (see :py:class:`AttributeCenter`).
+        :param name: Name to use in the XDMF-file [default: same as dataset]
+        :param index: Use only ``dataset[index, ...]`` (written as a 'HyperSlab').
         """
+        self = cls.__new__(cls)
+        self._init(filename, path, shape, center, name, index)
+        return self
 
-        if len(self.shape) == 1:
+    def _init(
+        self,
+        filename: str,
+        path: str,
+        shape: tuple[int, ...],
+        center: str,
+        name: str,
+        index: int = None,
+    ):
+        self._set_dataset(filename, path, shape, name)
+        self.center = center
+        self.index = index
+
+        if index is not None:
+            assert len(self.shape) > 1
+            if index < 0:
+                self.index += self.shape[0]
+            assert 0 <= self.index < self.shape[0]
+            shape = self.shape[1:]
+        else:
+            shape = self.shape
+
+        assert len(shape) > 0
+        assert len(shape) < 3
+
+        if len(shape) == 1:
             t = "Scalar"
-        elif len(self.shape) == 2:
+        elif len(shape) == 2:
             t = "Vector"
         else:
             raise OSError("Type of data cannot be deduced")
 
-        ret = []
-        ret += [f'<Attribute AttributeType="{t}" Center="{self.center}" Name="{self.name}">']
-        ret += [
-            (
-                f'<DataItem Dimensions="{self.shape_str}" Format="HDF"> '
-                f"{self.filename}:{self.path} </DataItem>"
-            )
-        ]
-        ret += ["</Attribute>"]
+        self._open = _ATTRIBUTE % (t, self.center, self.name)
 
-        return ret
+    def __list__(self) -> list[str]:
+        """
+        :return: XDMF code snippet.
+        """
+
+        if self.index is not None:
+            return [
+                self._open,
+                *_hyperslab(self.index, self.shape, self.filename, self.path),
+                _CLOSE_ATTRIBUTE,
+            ]
+
+        return [
+            self._open,
+            _dataitem(self.shape_str, self.filename, self.path),
+            _CLOSE_ATTRIBUTE,
+        ]
 
 
-def _asfile(lines: list[str]) -> str:
+def _iter_indented(lines: Iterable[str], indent: str = "  ", depth: int = 0) -> Iterator[str]:
     """
-    Convert a list of lines to an XDMF-file.
-    :param lines: List of lines.
-    :return: XDMF-file.
+    Indent XML lines (one tag per line) according to their nesting.
+    :param lines: Lines.
+    :param indent: Indentation of one level.
+    :param depth: Nesting depth of the first line.
+    :return: Indented lines (generator).
     """
-    ret = []
-    ret += ['<Xdmf Version="3.0">']
-    ret += ["<Domain>"]
-    ret += lines
-    ret += ["</Domain>"]
-    ret += ["</Xdmf>"]
-    return ret
+
+    for line in lines:
+        if line.startswith("</"):
+            depth -= 1
+        yield indent * depth + line
+        if (
+            line.startswith("<")
+            and not line.startswith(("<?", "<!", "</"))
+            and not line.endswith("/>")
+            and "</" not in line
+        ):
+            depth += 1
 
 
 class File:
@@ -252,23 +488,66 @@ class File:
     Base class of XDMF-files.
     The class allows (requires) to open the file in context-manager mode.
 
+    In context-manager mode the XDMF-file is opened on entry,
+    and all content is written to it as soon as it is added (instead of being stored).
+    The closing tags are written on exit.
+    As a consequence, ``str()`` and :py:func:`write` are not available
+    once the file has been used as context manager (they raise ``RuntimeError``).
+
     :param filename: Filename of the XDMF-file.
     :param mode: Write mode.
     """
 
+    __slots__ = ("filename", "mode", "lines", "_dirname", "_fp", "_streamed")
+
+    # nesting depth of the content
+    _depth = 2
+
     def __init__(self, filename: str, mode: str = "w"):
         self.filename = filename
+        self._dirname = os.path.dirname(os.fspath(filename)) or os.curdir
         self.mode = mode
         self.lines = []
+        self._fp = None
+        self._streamed = False
 
     def __iter__(self):
         return iter(self.__list__())
 
     def __str__(self) -> str:
-        return minidom.parseString("\n".join(self.__list__())).toprettyxml(newl="")
+        return "\n".join(_iter_indented(self.__list__())) + "\n"
+
+    def write(self, fp: TextIO):
+        """
+        Write the XDMF-file to an opened file (line-by-line).
+        :param fp: File object (opened in text mode).
+        """
+        fp.writelines(f"{line}\n" for line in _iter_indented(self.__list__()))
+
+    def _prologue(self) -> list[str]:
+        """
+        :return: Opening lines of the XDMF-file (before the content).
+        """
+        return list(_OPEN_XDMF)
+
+    def _epilogue(self) -> list[str]:
+        """
+        :return: Closing lines of the XDMF-file (after the content, only closing tags).
+        """
+        return list(_CLOSE_XDMF)
+
+    def _content(self) -> list[str]:
+        """
+        :return: Stored content of the XDMF-file (between prologue and epilogue).
+        """
+        return self.lines
 
     def __list__(self) -> list[str]:
-        return _asfile(self.lines)
+        if self._streamed:
+            raise RuntimeError(
+                f"{self.filename} was written in context-manager mode, its content is not stored"
+            )
+        return [*self._prologue(), *self._content(), *self._epilogue()]
 
     def __add__(self, content: Field | list[str] | str):
         """
@@ -276,24 +555,58 @@ class File:
         :param content: Content to add.
         """
 
-        if isinstance(content, list):
-            self.lines += content
-            return self
+        self._push(self._render(content))
+        return self
+
+    def _render(self, content: Field | list[str] | str) -> list[str]:
+        """
+        :param content: Content to add.
+        :return: Lines of the content, with paths relative to the XDMF-file.
+        """
 
+        # fields are by far the most common: test them first
         if isinstance(content, Field):
-            content.relpath(self.filename)  # todo: operation that does not modify "content"
-            self.lines += list(content)
-            return self
+            content._relto(self._dirname)  # todo: operation that does not modify "content"
+            return content.__list__()
 
-        self.lines += [content]
-        return self
+        if isinstance(content, list):
+            return content
+
+        return [content]
+
+    def _push(self, lines: list[str]):
+        """
+        Store lines, or write them directly if the file is open.
+        :param lines: Lines.
+        """
+        if self._fp is None:
+            self.lines.extend(lines)
+        else:
+            self._write(lines, self._depth)
+
+    def _write(self, lines: Iterable[str], depth: int = 0):
+        """
+        Write lines to the opened file.
+        :param lines: Lines.
+        :param depth: Nesting depth of the first line.
+        """
+        self._fp.writelines(f"{line}\n" for line in _iter_indented(lines, depth=depth))
 
     def __enter__(self):
+        # write everything but the closing tags (including content that was already added)
+        self._fp = open(self.filename, self.mode)
+        self._streamed = True
+        self._write([*self._prologue(), *self._content()])
+        self.lines.clear()
         return self
 
     def __exit__(self, *args):
-        with open(self.filename, self.mode) as file:
-            file.write(str(self))
+        try:
+            epilogue = self._epilogue()
+            self._write(epilogue, len(epilogue))
+        finally:
+            self._fp.close()
+            self._fp = None
 
 
 class TimeStep:
@@ -304,6 +617,8 @@ class TimeStep:
     :param time: Value of time
     """
 
+    __slots__ = ("name", "time")
+
     def __init__(self, name: str = None, time: float = None):
         self.name = name
         self.time = time
@@ -326,20 +641,23 @@ class Grid(File):
     :param name: Name of the grid.
     """
 
+    __slots__ = ("name",)
+
+    _depth = 4
+
     def __init__(self, filename: str, mode: str = "w", name: str = "Grid"):
         super().__init__(filename, mode)
         self.name = name
 
-    def __list__(self) -> list[str]:
-
-        ret = []
-        ret += [f'<Grid CollectionType="Temporal" GridType="Collection" Name="{self.name}">']
-        ret += [f'<Grid Name="{self.name}">']
-        ret += self.lines
-        ret += ["</Grid>"]
-        ret += ["</Grid>"]
+    def _prologue(self) -> list[str]:
+        return [
+            *super()._prologue(),
+            _COLLECTION % self.name,
+            _GRID % self.name,
+        ]
 
-        return _asfile(ret)
+    def _epilogue(self) -> list[str]:
+        return [_CLOSE_GRID, _CLOSE_GRID, *super()._epilogue()]
 
 
 class TimeSeries(File):
@@ -373,48 +691,144 @@ class TimeSeries(File):
     :param name: Name of the TimeSeries.
     """
 
+    __slots__ = ("name", "start", "headers", "_fragments", "_nstep", "_step_open")
+
+    _depth = 4
+
     def __init__(self, filename: str, mode: str = "w", name: str = "TimeSeries"):
         super().__init__(filename, mode)
         self.name = name
+        self.lines = collections.deque()  # only appended to, and read back in one pass
         self.start = []
-        self.settings = []
+        self.headers = []
+        self._fragments = {}
+        self._nstep = 0
+        self._step_open = False  # only while writing directly: last time-step not yet closed
 
     def __add__(self, other: TimeStep | Field | list[str] | str):
 
         if isinstance(other, TimeStep):
-            self.start += [len(self.lines)]
-            self.settings += [other]
+            i = self._nstep
+            name = f"Increment {i:d}" if other.name is None else other.name
+            t = i if other.time is None else other.time
+            header = (_GRID % name, _TIMESTEP_TIME % t)
+            self._nstep += 1
+            if self._fp is None:
+                self.start.append(len(self.lines))
+                self.headers.append(header)
+            else:
+                if self._step_open:
+                    self._write([_CLOSE_GRID], self._depth)
+                    self._fp.flush()  # all completed time-steps are on disk
+                self._write(header, self._depth - 1)
+                self._step_open = True
             return self
 
         super().__add__(other)
         return self
 
-    def __list__(self) -> list[str]:
+    def extend_batch(
+        self,
+        steps: Iterable[Iterable[Field | list[str] | str]],
+        common: Iterable[Field | list[str] | str] = (),
+        timesteps: list[TimeStep] = None,
+    ):
+        """
+        Add several time-steps at once. Equivalent to::
 
-        ret = []
-        ret += [f'<Grid CollectionType="Temporal" GridType="Collection" Name="{self.name}">']
+            for i, step in enumerate(steps):
+                xdmf += xh.TimeStep() if timesteps is None else timesteps[i]
+                for content in [*common, *step]:
+                    xdmf += content
 
-        start = [i for i in self.start] + [len(self.lines)]
+        but the content that is ``common`` to all time-steps (e.g. the grid) is rendered only once.
 
-        for i in range(len(self.start)):
+        Usage::
 
-            if self.settings[i].name is None:
-                name = f"Increment {i:d}"
-            else:
-                name = self.settings[i].name
+            xdmf.extend_batch(
+                [[xh.Attribute(disp, "Node", name="Disp", index=i)] for i in range(n)],
+                common=[xh.Unstructured(file["coor"], file["conn"], "Quadrilateral")],
+            )
 
-            if self.settings[i].time is None:
-                t = i
-            else:
-                t = self.settings[i].time
+        :param steps: Per time-step: the content to add.
+        :param common: Content to add to every time-step.
+        :param timesteps: Per time-step: the :py:class:`TimeStep` (default: ``TimeStep()``).
+        """
+
+        common = [line for content in common for line in self._render(content)]
+
+        for i, step in enumerate(steps):
+            self.__add__(TimeStep() if timesteps is None else timesteps[i])
+            self._push([*common, *itertools.chain.from_iterable(map(self._render, step))])
+
+        return self
+
+    def _push(self, lines: list[str]):
+        """
+        Store lines, sharing one string object between identical lines
+        (e.g. the same Geometry and Topology that is repeated for every time-step).
+        If the file is open, the lines are written directly instead
+        (content added before the first time-step is ignored, as when storing).
+        :param lines: Lines.
+        """
+        if self._fp is not None:
+            if self._step_open:
+                self._write(lines, self._depth)
+            return
+
+        unique = self._fragments.setdefault
+        self.lines.extend(unique(line, line) for line in lines)
+
+    def _prologue(self) -> list[str]:
+        return [
+            *super()._prologue(),
+            _COLLECTION % self.name,
+        ]
+
+    def _epilogue(self) -> list[str]:
+        return [_CLOSE_GRID, *super()._epilogue()]
 
-            ret += [f'<Grid Name="{name}">']
-            ret += [f'<Time Value="{str(t)}"/>']
-            ret += self.lines[start[i] : start[i + 1]]  # noqa: E203
-            ret += ["</Grid>"]
+    def _content(self) -> list[str]:
 
-        ret += ["</Grid>"]
-        return _asfile(ret)
+        ret = []
+        lines = iter(self.lines)
+        stop = [*self.start[1:], len(self.lines)]
+
+        # single pass over the stored lines: skip content before the first time-step (ignored)
+        if len(self.start) > 0:
+            collections.deque(itertools.islice(lines, self.start[0]), maxlen=0)
+
+        for header, i, j in zip(self.headers, self.start, stop):
+            ret.extend(header)
+            ret.extend(itertools.islice(lines, j - i))
+            ret.append(_CLOSE_GRID)
+
+        return ret
+
+    def __enter__(self):
+        # stored time-steps are written, the last one is left open (to add content to it)
+        self._fp = open(self.filename, self.mode)
+        self._streamed = True
+        lines = [*self._prologue(), *self._content()]
+        if len(self.headers) > 0:
+            lines.pop()
+            self._step_open = True
+        self._write(lines)
+        # from here on nothing is stored: release the stored lines,
+        # and the fragments that were only kept to share strings between them
+        self.lines.clear()
+        self.start = []
+        self.headers = []
+        self._fragments = {}
+        return self
+
+    def __exit__(self, *args):
+        if self._step_open:
+            self._write([_CLOSE_GRID], self._depth)
+            self._step_open = False
+        # the written file is complete, a new one starts at the first time-step
+        self._nstep = 0
+        super().__exit__(*args)
 
 
 class _Grid(Field):
@@ -431,12 +845,12 @@ class _Grid(Field):
     def __iter__(self):
         return iter(self.__list__())
 
-    def relpath(self, path: str | pathlib.Path):
-        self.geometry.relpath(path)
-        self.topology.relpath(path)
+    def _relto(self, dirname: str):
+        self.geometry._relto(dirname)
+        self.topology._relto(dirname)
 
     def __list__(self) -> list[str]:
-        return list(self.geometry) + list(self.topology)
+        return [*self.geometry.__list__(), *self.topology.__list__()]
 
 
 class Structured(_Grid):
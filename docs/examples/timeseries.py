@@ -43,15 +43,18 @@ file_xdmf = root.with_suffix(".xdmf")
 
 with h5py.File(file_hdf5, "w") as file, xh.TimeSeries(file_xdmf) as xdmf:
 
-    file["coor"] = coor
-    file["conn"] = conn
+    coor_ds = file.create_dataset("coor", data=coor)
+    conn_ds = file.create_dataset("conn", data=conn)
+    disp_ds = file.create_dataset("disp", (4, disp.shape[0], 3), dtype=disp.dtype)
+    stress_ds = file.create_dataset("stress", (4, *stress.shape), dtype=stress.dtype)
+    disp3d = xh.as3d(disp)
 
     for i in range(4):
 
-        file[f"/stress/{i:d}"] = float(i) * stress
-        file[f"/disp/{i:d}"] = float(i) * xh.as3d(disp)
+        stress_ds[i] = float(i) * stress
+        disp_ds[i] = float(i) * disp3d
 
         xdmf += xh.TimeStep()
-        xdmf += xh.Unstructured(file["coor"], file["conn"], xh.ElementType.Quadrilateral)
-        xdmf += xh.Attribute(file[f"/disp/{i:d}"], xh.AttributeCenter.Node, name="Displacement")
-        xdmf += xh.Attribute(file[f"/stress/{i:d}"], xh.AttributeCenter.Cell, name="Stress")
+        xdmf += xh.Unstructured(coor_ds, conn_ds, xh.ElementType.Quadrilateral)
+        xdmf += xh.Attribute(disp_ds, xh.AttributeCenter.Node, name="Displacement", index=i)
+        xdmf += xh.Attribute(stress_ds, xh.AttributeCenter.Cell, name="Stress", index=i)
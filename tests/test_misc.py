@@ -1,22 +1,76 @@
+import io
 import os
 import pathlib
+import shutil
+import tempfile
 import unittest
+from xml.etree import ElementTree
 
 import h5py
 import numpy as np
 
 import XDMFWrite_h5py as xh
 
-root = pathlib.Path(__file__).parent
-hdf5_file = root / "tmp.h5"
-xdmf_file = root / "tmp.xdmf"
+in_memory = dict(driver="core", backing_store=False)
+_rng = np.random.default_rng(0)
+
+
+def _canonical(text):
+    return ElementTree.canonicalize(text.strip(), strip_text=True)
 
 
 class TestMisc(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+
+        cls.coor = np.array(
+            [
+                [0, 0],
+                [0, 1],
+                [0, 2],
+                [1, 0],
+                [1, 1],
+                [1, 2],
+            ],
+            dtype=np.float32,
+        )
+
+        cls.conn = np.array(
+            [
+                [0, 1, 4, 3],
+                [1, 2, 5, 4],
+            ],
+            dtype=np.int32,
+        )
+
+        cls.disp = np.array(
+            [
+                [0.0, 0.0],
+                [0.1, 0.0],
+                [0.2, 0.0],
+                [0.0, 0.0],
+                [0.1, 0.0],
+                [0.2, 0.0],
+            ]
+        )
+
+        cls.stress = np.array([1.0, 2.0])
+
+    def setUp(self):
+
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.hdf5_file = self.tmpdir / "tmp.h5"
+        self.xdmf_file = self.tmpdir / "tmp.xdmf"
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
     def test_grid_structured(self):
 
         expected = """
-<?xml version="1.0" ?><Xdmf Version="3.0">
+<?xml version="1.0" ?>
+<Xdmf Version="3.0">
     <Domain>
         <Grid CollectionType="Temporal" GridType="Collection" Name="Grid">
             <Grid Name="Grid">
@@ -35,48 +89,28 @@ class TestMisc(unittest.TestCase):
 </Xdmf>
         """
 
-        coor = np.array(
-            [
-                [0, 0],
-                [0, 1],
-                [0, 2],
-                [1, 0],
-                [1, 1],
-                [1, 2],
-            ]
-        )
+        conn = np.arange(self.coor.shape[0], dtype=np.int32)
 
-        conn = np.arange(coor.shape[0])
+        radius = _rng.random(self.coor.shape[0], dtype=np.float32)
 
-        radius = np.random.random(coor.shape[0])
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file, xh.Grid(self.xdmf_file) as xdmf:
 
-        with h5py.File(hdf5_file, "w") as file, xh.Grid(xdmf_file) as xdmf:
-
-            file["coor"] = coor
+            file["coor"] = self.coor
             file["conn"] = conn
             file["radius"] = radius
 
             xdmf += xh.Structured(file["coor"], file["conn"])
             xdmf += xh.Attribute(file["radius"], "Node")
 
-        with open(xdmf_file) as file:
-            output = file.read()
-            output = output.strip().replace("\t", "    ").split("\n")
-
-        expected = expected.strip().split("\n")
-
-        os.remove(hdf5_file)
-        os.remove(xdmf_file)
+        output = self.xdmf_file.read_text()
 
-        self.assertEqual(len(output), len(expected))
-
-        for i in range(len(output)):
-            self.assertEqual(output[i].strip(), expected[i].strip())
+        self.assertEqual(_canonical(output), _canonical(expected))
 
     def test_grid_unstructured(self):
 
         expected = """
-<?xml version="1.0" ?><Xdmf Version="3.0">
+<?xml version="1.0" ?>
+<Xdmf Version="3.0">
     <Domain>
         <Grid CollectionType="Temporal" GridType="Collection" Name="Grid">
             <Grid Name="Grid">
@@ -95,72 +129,24 @@ class TestMisc(unittest.TestCase):
 </Xdmf>
         """
 
-        coor = np.array(
-            [
-                [0, 0],
-                [0, 1],
-                [0, 2],
-                [1, 0],
-                [1, 1],
-                [1, 2],
-            ]
-        )
-
-        conn = np.array(
-            [
-                [0, 1, 4, 3],
-                [1, 2, 5, 4],
-            ]
-        )
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file, xh.Grid(self.xdmf_file) as xdmf:
 
-        stress = np.array([1.0, 2.0])
-
-        with h5py.File(hdf5_file, "w") as file, xh.Grid(root / "grid_unstructured.xdmf") as xdmf:
-
-            file["coor"] = coor
-            file["conn"] = conn
-            file["stress"] = stress
+            file["coor"] = self.coor
+            file["conn"] = self.conn
+            file["stress"] = self.stress
 
             xdmf += xh.Unstructured(file["coor"], file["conn"], "Quadrilateral")
             xdmf += xh.Attribute(file["stress"], "Cell")
 
-        with open(root / "grid_unstructured.xdmf") as file:
-            output = file.read()
-            output = output.strip().replace("\t", "    ").split("\n")
+        output = self.xdmf_file.read_text()
 
-        expected = expected.strip().split("\n")
-
-        os.remove(hdf5_file)
-        os.remove(root / "grid_unstructured.xdmf")
-
-        self.assertEqual(len(output), len(expected))
-
-        for i in range(len(output)):
-            self.assertEqual(output[i].strip(), expected[i].strip())
+        self.assertEqual(_canonical(output), _canonical(expected))
 
     def test_timeseries(self):
 
-        expected = """
-<?xml version="1.0" ?><Xdmf Version="3.0">
-    <Domain>
-        <Grid CollectionType="Temporal" GridType="Collection" Name="TimeSeries">
-            <Grid Name="Increment 0">
-                <Time Value="0"/>
-                <Geometry GeometryType="XY">
-                    <DataItem Dimensions="6 2" Format="HDF"> tmp.h5:/coor </DataItem>
-                </Geometry>
-                <Topology NumberOfElements="2" TopologyType="Quadrilateral">
-                    <DataItem Dimensions="2 4" Format="HDF"> tmp.h5:/conn </DataItem>
-                </Topology>
-                <Attribute AttributeType="Vector" Center="Node" Name="Disp">
-                    <DataItem Dimensions="6 3" Format="HDF"> tmp.h5:/disp/0 </DataItem>
-                </Attribute>
-                <Attribute AttributeType="Scalar" Center="Cell" Name="Stress">
-                    <DataItem Dimensions="2" Format="HDF"> tmp.h5:/stress/0 </DataItem>
-                </Attribute>
-            </Grid>
-            <Grid Name="Increment 1">
-                <Time Value="1"/>
+        increment = """
+            <Grid Name="Increment {i:d}">
+                <Time Value="{i:d}"/>
                 <Geometry GeometryType="XY">
                     <DataItem Dimensions="6 2" Format="HDF"> tmp.h5:/coor </DataItem>
                 </Geometry>
@@ -168,29 +154,238 @@ class TestMisc(unittest.TestCase):
                     <DataItem Dimensions="2 4" Format="HDF"> tmp.h5:/conn </DataItem>
                 </Topology>
                 <Attribute AttributeType="Vector" Center="Node" Name="Disp">
-                    <DataItem Dimensions="6 3" Format="HDF"> tmp.h5:/disp/1 </DataItem>
+                    <DataItem Dimensions="6 3" Format="HDF"> tmp.h5:/disp/{i:d} </DataItem>
                 </Attribute>
                 <Attribute AttributeType="Scalar" Center="Cell" Name="Stress">
-                    <DataItem Dimensions="2" Format="HDF"> tmp.h5:/stress/1 </DataItem>
+                    <DataItem Dimensions="2" Format="HDF"> tmp.h5:/stress/{i:d} </DataItem>
                 </Attribute>
             </Grid>
-            <Grid Name="Increment 2">
-                <Time Value="2"/>
-                <Geometry GeometryType="XY">
-                    <DataItem Dimensions="6 2" Format="HDF"> tmp.h5:/coor </DataItem>
-                </Geometry>
-                <Topology NumberOfElements="2" TopologyType="Quadrilateral">
-                    <DataItem Dimensions="2 4" Format="HDF"> tmp.h5:/conn </DataItem>
-                </Topology>
-                <Attribute AttributeType="Vector" Center="Node" Name="Disp">
-                    <DataItem Dimensions="6 3" Format="HDF"> tmp.h5:/disp/2 </DataItem>
-                </Attribute>
-                <Attribute AttributeType="Scalar" Center="Cell" Name="Stress">
-                    <DataItem Dimensions="2" Format="HDF"> tmp.h5:/stress/2 </DataItem>
-                </Attribute>
-            </Grid>
-            <Grid Name="Increment 3">
-                <Time Value="3"/>
+        """
+
+        expected = (
+            """
+<?xml version="1.0" ?>
+<Xdmf Version="3.0">
+    <Domain>
+        <Grid CollectionType="Temporal" GridType="Collection" Name="TimeSeries">
+            """
+            + "".join(increment.format(i=i) for i in range(4))
+            + """
+        </Grid>
+    </Domain>
+</Xdmf>
+            """
+        )
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file, xh.TimeSeries(
+            self.xdmf_file
+        ) as xdmf:
+
+            coor = file.create_dataset("coor", data=self.coor)
+            conn = file.create_dataset("conn", data=self.conn)
+            disp = xh.as3d(self.disp)
+
+            for i in range(4):
+
+                stress_i = file.create_dataset(f"/stress/{i:d}", data=float(i) * self.stress)
+                disp_i = file.create_dataset(f"/disp/{i:d}", data=float(i) * disp)
+
+                xdmf += xh.TimeStep()
+                xdmf += xh.Unstructured(coor, conn, xh.ElementType.Quadrilateral)
+                xdmf += xh.Attribute(disp_i, xh.AttributeCenter.Node, name="Disp")
+                xdmf += xh.Attribute(stress_i, xh.AttributeCenter.Cell, name="Stress")
+
+        output = self.xdmf_file.read_text()
+
+        self.assertEqual(_canonical(output), _canonical(expected))
+
+    def test_dataset_shapes(self):
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
+
+            file["coor"] = np.zeros((6, 2))
+            file["/stress/0"] = np.zeros(2)
+            file["/stress/1"] = np.zeros(2)
+
+            shapes = xh.dataset_shapes(file)
+            subset = xh.dataset_shapes(file, ["/stress/1"])
+
+        self.assertEqual(shapes, {"/coor": (6, 2), "/stress/0": (2,), "/stress/1": (2,)})
+        self.assertEqual(subset, {"/stress/1": (2,)})
+
+    def test_as3d(self):
+
+        disp = np.array([[1.0, 2.0], [3.0, 4.0]])
+        expected = np.array([[1.0, 2.0, 0.0], [3.0, 4.0, 0.0]])
+
+        self.assertTrue(np.all(xh.as3d(disp) == expected))
+
+        out = np.ones((2, 3))
+        self.assertIs(xh.as3d(disp, out=out), out)
+        self.assertTrue(np.all(out == expected))
+
+    def test_topology_element_type(self):
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
+
+            file["conn"] = np.zeros((2, 4), dtype=int)
+
+            with self.assertRaises(ValueError):
+                xh.Topology(file["conn"], "Quad")
+
+            with self.assertRaises(OSError):
+                xh.Topology(file["conn"], xh.ElementType.Triangle)
+
+    def test_from_path(self):
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
+
+            file["coor"] = np.zeros((6, 2))
+            file["conn"] = np.zeros((2, 4), dtype=int)
+            file["stress"] = np.zeros(2)
+
+            expected = [
+                str(xh.Geometry(file["coor"])),
+                str(xh.Topology(file["conn"], xh.ElementType.Quadrilateral)),
+                str(xh.Attribute(file["stress"], xh.AttributeCenter.Cell, name="Stress")),
+            ]
+
+            shapes = xh.dataset_shapes(file)
+            output = [
+                str(xh.Geometry.from_path(file.filename, "/coor", shapes["/coor"])),
+                str(
+                    xh.Topology.from_path(
+                        file.filename, "/conn", shapes["/conn"], xh.ElementType.Quadrilateral
+                    )
+                ),
+                str(
+                    xh.Attribute.from_path(
+                        file.filename, "/stress", shapes["/stress"], "Cell", name="Stress"
+                    )
+                ),
+            ]
+
+        self.assertEqual(output, expected)
+
+    def test_write(self):
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
+
+            file["coor"] = np.zeros((6, 2))
+            file["conn"] = np.arange(6)
+
+            grid = xh.Structured(file["coor"], file["conn"])
+            xdmf = xh.Grid(self.xdmf_file)
+            xdmf += grid
+
+        for obj in [grid, xdmf]:
+            stream = io.StringIO()
+            obj.write(stream)
+            self.assertEqual(stream.getvalue().rstrip("\n"), str(obj).rstrip("\n"))
+
+    def test_timeseries_stream(self):
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
+
+            coor = file.create_dataset("coor", data=np.zeros((6, 2)))
+            conn = file.create_dataset("conn", data=np.arange(6))
+            radius = file.create_dataset("radius", data=np.zeros(6))
+
+            stored = xh.TimeSeries(self.xdmf_file)
+
+            with xh.TimeSeries(self.xdmf_file) as xdmf:
+                for i in range(3):
+                    for obj in [xdmf, stored]:
+                        obj += xh.TimeStep(time=0.5 * i)
+                        obj += xh.Structured(coor, conn)
+                        obj += xh.Attribute(radius, "Node")
+
+        output = self.xdmf_file.read_text()
+
+        self.assertEqual(output, str(stored))
+
+    def test_timeseries_stream_reenter(self):
+
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
+
+            coor = file.create_dataset("coor", data=np.zeros((6, 2)))
+            conn = file.create_dataset("conn", data=np.arange(6))
+
+            stored = xh.TimeSeries(self.xdmf_file)
+            xdmf = xh.TimeSeries(self.xdmf_file)
+
+            with xdmf:
+                for i in range(3):
+                    for obj in [xdmf, stored]:
+                        obj += xh.TimeStep()
+                        obj += xh.Structured(coor, conn)
+
+                # nothing is stored while writing
+                self.assertEqual(len(xdmf.lines), 0)
+                self.assertEqual(len(xdmf.headers), 0)
+                with self.assertRaises(RuntimeError):
+                    str(xdmf)
+                with self.assertRaises(RuntimeError):
+                    xdmf.write(io.StringIO())
+
+            with self.assertRaises(RuntimeError):
+                str(xdmf)
+
+            self.assertEqual(self.xdmf_file.read_text(), str(stored))
+
+            # re-entering writes a new file: stored content (last time-step left open) + new content
+            stored = xh.TimeSeries(self.xdmf_file)
+
+            for obj in [xdmf, stored]:
+                obj += xh.TimeStep()
+                obj += xh.Structured(coor, conn)
+
+            with xdmf:
+                for obj in [xdmf, stored]:
+                    obj += xh.Attribute(file["coor"], "Node")
+                    obj += xh.TimeStep()
+                    obj += xh.Structured(coor, conn)
+
+        output = self.xdmf_file.read_text()
+
+        self.assertEqual(output, str(stored))
+        self.assertEqual(output.count("<Geometry"), 2)
+        self.assertIn('<Grid Name="Increment 1">', output)
+
+    def test_relpath(self):
+
+        # HDF5-file in a sub-directory of the XDMF-file
+        hdf5_file = self.tmpdir / "sub" / "tmp.h5"
+
+        with h5py.File(hdf5_file, "w", **in_memory) as file:
+            file["coor"] = self.coor
+            xdmf = xh.Grid(self.xdmf_file)
+            xdmf += xh.Geometry(file["coor"])
+
+        self.assertIn(" sub/tmp.h5:/coor ", str(xdmf))
+
+        # HDF5-file without directory (current directory), XDMF-file with absolute path
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+
+        try:
+            with h5py.File("tmp.h5", "w", **in_memory) as file:
+                file["coor"] = self.coor
+                same = xh.Grid(self.tmpdir.absolute() / "tmp.xdmf")
+                same += xh.Geometry(file["coor"])
+                other = xh.Grid(self.tmpdir.absolute() / "sub" / "tmp.xdmf")
+                other += xh.Geometry(file["coor"])
+        finally:
+            os.chdir(cwd)
+
+        self.assertIn(" tmp.h5:/coor ", str(same))
+        self.assertIn(" ../tmp.h5:/coor ", str(other))
+
+    def test_timeseries_hyperslab(self):
+
+        increment = """
+            <Grid Name="Increment {i:d}">
+                <Time Value="{i:d}"/>
                 <Geometry GeometryType="XY">
                     <DataItem Dimensions="6 2" Format="HDF"> tmp.h5:/coor </DataItem>
                 </Geometry>
@@ -198,73 +393,87 @@ class TestMisc(unittest.TestCase):
                     <DataItem Dimensions="2 4" Format="HDF"> tmp.h5:/conn </DataItem>
                 </Topology>
                 <Attribute AttributeType="Vector" Center="Node" Name="Disp">
-                    <DataItem Dimensions="6 3" Format="HDF"> tmp.h5:/disp/3 </DataItem>
+                    <DataItem ItemType="HyperSlab" Dimensions="6 3" Type="HyperSlab">
+                        <DataItem Dimensions="3 3" Format="XML"> {i:d} 0 0 1 1 1 1 6 3 </DataItem>
+                        <DataItem Dimensions="4 6 3" Format="HDF"> tmp.h5:/disp </DataItem>
+                    </DataItem>
                 </Attribute>
                 <Attribute AttributeType="Scalar" Center="Cell" Name="Stress">
-                    <DataItem Dimensions="2" Format="HDF"> tmp.h5:/stress/3 </DataItem>
+                    <DataItem ItemType="HyperSlab" Dimensions="2" Type="HyperSlab">
+                        <DataItem Dimensions="3 2" Format="XML"> {i:d} 0 1 1 1 2 </DataItem>
+                        <DataItem Dimensions="4 2" Format="HDF"> tmp.h5:/stress </DataItem>
+                    </DataItem>
                 </Attribute>
             </Grid>
+        """
+
+        expected = (
+            """
+<?xml version="1.0" ?>
+<Xdmf Version="3.0">
+    <Domain>
+        <Grid CollectionType="Temporal" GridType="Collection" Name="TimeSeries">
+            """
+            + "".join(increment.format(i=i) for i in range(4))
+            + """
         </Grid>
     </Domain>
 </Xdmf>
-        """
-
-        coor = np.array(
-            [
-                [0, 0],
-                [0, 1],
-                [0, 2],
-                [1, 0],
-                [1, 1],
-                [1, 2],
-            ]
-        )
-
-        conn = np.array(
-            [
-                [0, 1, 4, 3],
-                [1, 2, 5, 4],
-            ]
-        )
-
-        disp = np.array(
-            [
-                [0.0, 0.0],
-                [0.1, 0.0],
-                [0.2, 0.0],
-                [0.0, 0.0],
-                [0.1, 0.0],
-                [0.2, 0.0],
-            ]
+            """
         )
 
-        stress = np.array([1.0, 2.0])
-
-        with h5py.File(hdf5_file, "w") as file, xh.TimeSeries(root / "timeseries.xdmf") as xdmf:
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file, xh.TimeSeries(
+            self.xdmf_file
+        ) as xdmf:
 
-            file["coor"] = coor
-            file["conn"] = conn
+            coor = file.create_dataset("coor", data=self.coor)
+            conn = file.create_dataset("conn", data=self.conn)
+            disp_ds = file.create_dataset("disp", (4, 6, 3), dtype=np.float64, chunks=(1, 6, 3))
+            stress_ds = file.create_dataset("stress", (4, 2), dtype=np.float64, chunks=(1, 2))
+            disp = xh.as3d(self.disp)
 
             for i in range(4):
 
-                file[f"/stress/{i:d}"] = float(i) * stress
-                file[f"/disp/{i:d}"] = float(i) * xh.as3d(disp)
+                stress_ds[i] = float(i) * self.stress
+                disp_ds[i] = float(i) * disp
 
                 xdmf += xh.TimeStep()
-                xdmf += xh.Unstructured(file["/coor"], file["/conn"], xh.ElementType.Quadrilateral)
-                xdmf += xh.Attribute(file[f"/disp/{i:d}"], xh.AttributeCenter.Node, name="Disp")
-                xdmf += xh.Attribute(file[f"/stress/{i:d}"], xh.AttributeCenter.Cell, name="Stress")
+                xdmf += xh.Unstructured(coor, conn, xh.ElementType.Quadrilateral)
+                xdmf += xh.Attribute(disp_ds, xh.AttributeCenter.Node, name="Disp", index=i)
+                xdmf += xh.Attribute(stress_ds, xh.AttributeCenter.Cell, name="Stress", index=i)
 
-        with open(root / "timeseries.xdmf") as file:
-            output = file.read()
-            output = output.strip().replace("\t", "    ").split("\n")
+        output = self.xdmf_file.read_text()
 
-        expected = expected.strip().split("\n")
+        self.assertEqual(_canonical(output), _canonical(expected))
 
-        os.remove(hdf5_file)
-        os.remove(root / "timeseries.xdmf")
+    def test_timeseries_extend_batch(self):
 
-        self.assertEqual(len(output), len(expected))
+        with h5py.File(self.hdf5_file, "w", **in_memory) as file:
 
-        for i in range(len(output)):
-            self.assertEqual(output[i].strip(), expected[i].strip())
+            coor = file.create_dataset("coor", data=self.coor)
+            conn = file.create_dataset("conn", data=self.conn)
+            disp = file.create_dataset("disp", data=np.zeros((4, 6, 3)))
+            stress = file.create_dataset("stress", data=np.zeros((4, 2)))
+
+            expected = xh.TimeSeries(self.xdmf_file)
+            output = xh.TimeSeries(self.xdmf_file)
+            steps = []
+
+            for i in range(4):
+                step = [
+                    xh.Attribute(disp, xh.AttributeCenter.Node, name="Disp", index=i),
+                    xh.Attribute(stress, xh.AttributeCenter.Cell, name="Stress", index=i),
+                ]
+                steps.append(step)
+                expected += xh.TimeStep(time=0.5 * i)
+                expected += xh.Unstructured(coor, conn, xh.ElementType.Quadrilateral)
+                for content in step:
+                    expected += content
+
+            output.extend_batch(
+                steps,
+                common=[xh.Unstructured(coor, conn, xh.ElementType.Quadrilateral)],
+                timesteps=[xh.TimeStep(time=0.5 * i) for i in range(4)],
+            )
+
+        self.assertEqual(str(output), str(expected))